@@ -1,6 +1,9 @@
+import ctranslate2
 from faster_whisper import WhisperModel
 from typing import List, Dict
 import logging
+import sys
+import os
 from halo import Halo
 from colorama import Fore, Style, init
 
@@ -42,31 +45,60 @@ class AudioTranscriber:
     def __init__(
         self,
         model_size: str = "base",
-        device: str = "cpu",
-        compute_type: str = "int8",
+        device: str = "auto",
+        compute_type: str | None = None,
         language: str | None = None,
+        cpu_threads: int | None = None,
+        num_workers: int = 1,
     ):
         """
         model_size: tiny | base | small | medium | large
-        device: cpu | cuda
-        compute_type: int8 | float16 | float32
+        device: auto | cpu | cuda
+        compute_type: int8 | int8_float16 | float16 | float32, or None to pick by device
         language: force language (e.g. 'en') or None for auto-detect
+        cpu_threads: CTranslate2 threads on cpu, or None for min(cpu count, 8)
+        num_workers: parallel transcriptions the model can serve
         """
-        logger.info(f"Loading Whisper model [{model_size}] on {device}")
+        device = self._resolve_device(device)
+        if compute_type is None:
+            compute_type = "int8_float16" if device == "cuda" else "int8"
+        if cpu_threads is None:
+            cpu_threads = min(os.cpu_count() or 1, 8)
+
+        logger.info(f"Loading Whisper model [{model_size}] on {device} ({compute_type})")
 
         spinner = Halo(
             text="Initializing Whisper model",
             spinner="dots",
-            color="cyan"
+            color="cyan",
+            enabled=sys.stdout.isatty(),
         )
         spinner.start()
 
         try:
-            self.model = WhisperModel(
-                model_size,
-                device=device,
-                compute_type=compute_type,
-            )
+            try:
+                self.model = WhisperModel(
+                    model_size,
+                    device=device,
+                    compute_type=compute_type,
+                    cpu_threads=cpu_threads,
+                    num_workers=num_workers,
+                )
+            except RuntimeError as e:
+                if device == "cpu":
+                    raise
+                logger.warning(f"Could not load model on {device} ({e}), falling back to cpu/int8")
+                device, compute_type = "cpu", "int8"
+                self.model = WhisperModel(
+                    model_size,
+                    device=device,
+                    compute_type=compute_type,
+                    cpu_threads=cpu_threads,
+                    num_workers=num_workers,
+                )
+
+            self.device = device
+            self.compute_type = compute_type
             self.language = language
             spinner.succeed("Model loaded successfully")
             logger.success("Whisper model ready")
@@ -76,16 +108,43 @@ class AudioTranscriber:
             logger.error(str(e))
             raise
 
-    def transcribe(self, audio_path: str) -> Dict:
+    @staticmethod
+    def _resolve_device(device: str) -> str:
+        """
+        Map 'auto' to cuda when a GPU is visible to CTranslate2, else cpu.
+        An explicit 'cuda' request without a GPU falls back to cpu with a warning.
+        """
+        has_cuda = ctranslate2.get_cuda_device_count() > 0
+
+        if device == "auto":
+            return "cuda" if has_cuda else "cpu"
+
+        if device == "cuda" and not has_cuda:
+            logger.warning("CUDA requested but not available, using cpu")
+            return "cpu"
+
+        return device
+
+    def transcribe(
+        self,
+        audio_path: str,
+        beam_size: int = 1,
+        vad_filter: bool = True,
+    ) -> Dict:
         """
         Transcribe an audio file and return text + segments.
+
+        beam_size: 1 for greedy decoding (fastest), higher for beam search
+        vad_filter: strip silence with Silero VAD before decoding, which also
+                    avoids hallucination loops on long silent stretches
         """
         logger.info(f"Starting transcription: {audio_path}")
 
         spinner = Halo(
             text="Transcribing audio",
             spinner="dots",
-            color="cyan"
+            color="cyan",
+            enabled=sys.stdout.isatty(),
         )
         spinner.start()
 
@@ -93,10 +152,14 @@ class AudioTranscriber:
             segments, info = self.model.transcribe(
                 audio_path,
                 language=self.language,
+                beam_size=beam_size,
+                vad_filter=vad_filter,
+                vad_parameters=dict(min_silence_duration_ms=500),
+                condition_on_previous_text=False,
+                word_timestamps=False,
             )
 
             text_segments: List[Dict] = []
-            full_text = []
 
             for segment in segments:
                 text_segments.append({
@@ -104,7 +167,6 @@ class AudioTranscriber:
                     "end": segment.end,
                     "text": segment.text.strip(),
                 })
-                full_text.append(segment.text.strip())
 
             spinner.succeed("Transcription completed")
             logger.success(
@@ -114,7 +176,7 @@ class AudioTranscriber:
             return {
                 "language": info.language,
                 "duration": info.duration,
-                "text": " ".join(full_text),
+                "text": " ".join(seg["text"] for seg in text_segments),
                 "segments": text_segments,
             }
 
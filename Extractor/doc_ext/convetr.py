@@ -1,14 +1,21 @@
+import os
 import subprocess
+import tempfile
 from pathlib import Path
 import logging
-from pdf2image import convert_from_path
+import sys
+import fitz
 from halo import Halo
+from tqdm.contrib.concurrent import process_map
 from colorama import Fore, Style, init
 
 init(autoreset=True)
 
 SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".pptx"}
 
+# Set DOC2IMG_USE_PDF2IMAGE=1 to render through poppler instead of PyMuPDF
+USE_PDF2IMAGE = os.getenv("DOC2IMG_USE_PDF2IMAGE", "0") == "1"
+
 # ---------------- LOGGER SETUP ---------------- #
 
 class ColorFormatter(logging.Formatter):
@@ -59,11 +66,20 @@ def convert_documents_to_images(input_path, output_dir):
 
         logger.info(f"Found {len(files)} documents")
 
+        jobs = []
         for file in files:
             rel = file.relative_to(input_path)
             out_folder = output_dir / rel.parent / file.stem
             out_folder.mkdir(parents=True, exist_ok=True)
-            _process_file(file, out_folder)
+            jobs.append((file, out_folder))
+
+        errors = _run_pipeline(jobs)
+
+        for (file, out_folder), error in zip(jobs, errors):
+            if error:
+                logger.error(f"Failed {file.name}: {error}")
+            else:
+                logger.success(f"Saved images to {out_folder}")
         return
 
     raise ValueError("Input path does not exist")
@@ -80,43 +96,132 @@ def _process_file(file_path, output_folder):
     spinner = Halo(
         text=f"Processing {file_path.name}",
         spinner="dots",
-        color="cyan"
+        color="cyan",
+        enabled=sys.stdout.isatty(),
     )
     spinner.start()
 
-    try:
-        if file_path.suffix.lower() == ".pdf":
-            _pdf_to_images(file_path, output_folder)
-        else:
-            _office_to_images(file_path, output_folder)
+    error = _run_pipeline([(file_path, output_folder)])[0]
 
+    if error:
+        spinner.fail(f"Failed {file_path.name}")
+        logger.error(error)
+    else:
         spinner.succeed(f"Converted {file_path.name}")
         logger.success(f"Saved images to {output_folder}")
 
-    except Exception as e:
-        spinner.fail(f"Failed {file_path.name}")
-        logger.error(str(e))
-
-def _office_to_images(file_path, output_folder):
-    temp_pdf = output_folder / f"{file_path.stem}.pdf"
-
-    subprocess.run(
-        [
-            "libreoffice",
-            "--headless",
-            "--convert-to", "pdf",
-            "--outdir", str(output_folder),
-            str(file_path),
-        ],
-        check=True,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
+def _run_pipeline(jobs):
+    """
+    Convert (file, output_folder) jobs in two stages:
+    office -> pdf in batched LibreOffice runs, then pdf -> png per document.
+    Returns an error message or None for each job.
+    """
+    errors = [None] * len(jobs)
+
+    with tempfile.TemporaryDirectory(prefix="doc2img_") as tmp:
+        office_files = [f for f, _ in jobs if f.suffix.lower() != ".pdf"]
+        tmp = Path(tmp)
+        pdfs, office_errors = _office_to_pdfs(office_files, tmp / "pdf", tmp / "lo_profile")
+
+        render_idx, render_pdfs, render_outs = [], [], []
+        for i, (file, out_folder) in enumerate(jobs):
+            if file in office_errors:
+                errors[i] = office_errors[file]
+                continue
+            render_idx.append(i)
+            render_pdfs.append(pdfs.get(file, file))
+            render_outs.append(out_folder)
+
+        if len(render_pdfs) > 1:
+            # Rendering is CPU-bound, so fan out across processes
+            results = process_map(
+                _render_pdf,
+                render_pdfs,
+                render_outs,
+                max_workers=os.cpu_count(),
+                chunksize=1,
+                desc="Converting documents",
+            )
+        else:
+            results = [_render_pdf(p, o) for p, o in zip(render_pdfs, render_outs)]
 
-    _pdf_to_images(temp_pdf, output_folder)
-    temp_pdf.unlink(missing_ok=True)
+        for i, error in zip(render_idx, results):
+            errors[i] = error
+
+    return errors
+
+def _render_pdf(pdf_path, output_folder):
+    """Render one PDF; returns an error message or None. Safe to run in a worker process."""
+    try:
+        _pdf_to_images(pdf_path, output_folder)
+        return None
+    except Exception as e:
+        return str(e)
+
+def _office_to_pdfs(office_files, pdf_dir, profile_dir):
+    """
+    Convert office files to PDF, starting LibreOffice once per batch instead of once per file.
+    Returns ({file: pdf_path}, {file: error}).
+    """
+    # LibreOffice names each output <stem>.pdf, so files sharing a stem go in separate batches
+    batches = []
+    for file in office_files:
+        for batch in batches:
+            if file.stem not in batch:
+                batch[file.stem] = file
+                break
+        else:
+            batches.append({file.stem: file})
+
+    pdfs, errors = {}, {}
+    for n, batch in enumerate(batches):
+        out_dir = pdf_dir / str(n)
+        out_dir.mkdir(parents=True)
+
+        try:
+            subprocess.run(
+                [
+                    "libreoffice",
+                    "--headless",
+                    # Private profile so we don't collide with a running LibreOffice;
+                    # it lives in the pipeline's temp dir and is removed with it
+                    f"-env:UserInstallation={profile_dir.as_uri()}",
+                    "--convert-to", "pdf",
+                    "--outdir", str(out_dir),
+                    *(str(f) for f in batch.values()),
+                ],
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except Exception as e:
+            for file in batch.values():
+                errors[file] = str(e)
+            continue
+
+        for stem, file in batch.items():
+            pdf = out_dir / f"{stem}.pdf"
+            if pdf.exists():
+                pdfs[file] = pdf
+            else:
+                errors[file] = "LibreOffice did not produce a PDF"
+
+    return pdfs, errors
 
 def _pdf_to_images(pdf_path, output_folder):
+    if USE_PDF2IMAGE:
+        _pdf_to_images_poppler(pdf_path, output_folder)
+        return
+
+    # Rendered in-process, no poppler subprocess
+    with fitz.open(pdf_path) as doc:
+        for i, page in enumerate(doc, start=1):
+            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
+            pix.save(output_folder / f"page_{i:03d}.png")
+
+def _pdf_to_images_poppler(pdf_path, output_folder):
+    from pdf2image import convert_from_path
+
     images = convert_from_path(pdf_path)
     for i, img in enumerate(images, start=1):
         img.save(output_folder / f"page_{i:03d}.png", "PNG")
@@ -1,22 +1,89 @@
+from __future__ import annotations
+
 import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
 from pydoc import text
-from Extractor.online_ext import WebCrawlerService
-from Extractor.audio_ext import AudioTranscriber
+from typing import TYPE_CHECKING
+
+# faster_whisper and crawl4ai are slow to import, so load them on first use
+if TYPE_CHECKING:
+    from Extractor.online_ext import WebCrawlerService
+    from Extractor.audio_ext import AudioTranscriber
+
+@lru_cache(maxsize=4)
+def get_transcriber(
+    model_size: str = "base",
+    device: str = "auto",
+    compute_type: str | None = None,
+    language: str | None = None,
+) -> AudioTranscriber:
+    from Extractor.audio_ext import AudioTranscriber
+
+    # Loading Whisper weights is the slow part, so keep one model per config
+    return AudioTranscriber(
+        model_size=model_size,
+        device=device,
+        compute_type=compute_type,
+        language=language,
+    )
 
 async def transcribe_audio(file_path: str): 
-    transcriber = AudioTranscriber(
+    transcriber = get_transcriber(
         model_size="base",
-        device="cpu",
+        device="auto",
     )
     transcript = transcriber.transcribe(audio_path=file_path)
     return transcript
 
-async def crawl(url: str = None):
-    # Initialize crawler service
-    crawler = WebCrawlerService(
+# Set inside shared_crawler(); holds the task starting the shared browser
+_shared_slot: ContextVar[dict | None] = ContextVar("_shared_slot", default=None)
+
+def _new_crawler() -> WebCrawlerService:
+    from Extractor.online_ext import WebCrawlerService
+
+    return WebCrawlerService(
         headless=True,
         verbose=True,
     )
+
+async def _start_crawler() -> WebCrawlerService:
+    crawler = _new_crawler()
+    await crawler.__aenter__()
+    return crawler
+
+@asynccontextmanager
+async def shared_crawler():
+    """
+    Within this block crawl() reuses one browser, started on the first crawl
+    and closed when the block exits. Outside it, every crawl() opens and closes its own.
+    """
+    slot = {}
+    token = _shared_slot.set(slot)
+    try:
+        yield
+    finally:
+        _shared_slot.reset(token)
+        if "crawler" in slot:
+            try:
+                crawler = await slot["crawler"]
+            except Exception:
+                # Startup failed, so there is no browser to close
+                crawler = None
+            if crawler is not None:
+                await crawler.__aexit__(None, None, None)
+
+async def crawl(url: str = None):
+    # Initialize crawler service
+    slot = _shared_slot.get()
+    if slot is None:
+        crawler = _new_crawler()
+    else:
+        if "crawler" not in slot:
+            # Claim the slot before awaiting so concurrent crawls share one startup
+            slot["crawler"] = asyncio.ensure_future(_start_crawler())
+        crawler = await slot["crawler"]
     # URL to crawl
     # Call crawler
     result = await crawler.crawl(
@@ -1,71 +1,148 @@
-import json
+import re
+import io
 import base64
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 from pathlib import Path
+from PIL import Image
 
 class ImageExtractor:
-    def __init__(self, model_name: str = "qwen3-vl:4b", ollama_host: str = "http://localhost:11434"):
+    def __init__(self, model_name: str = "qwen3-vl:4b", ollama_host: str = "http://localhost:11434", pool_size: int = 16):
         self.model_name = model_name
         self.ollama_host = ollama_host
         self.endpoint = f"{ollama_host}/api/generate"
+
+        # Keep-alive session so repeated calls reuse the same connection;
+        # pool_size should cover the number of threads calling extract_data at once
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
     
-    def encode_image(self, image_path: str) -> str:
-        """Encode image to base64"""
+    def encode_image(self, image_path: str, max_side: int | None = None) -> str:
+        """Encode image to base64, downscaling it first if its longest side exceeds max_side"""
+        if max_side:
+            with Image.open(image_path) as im:
+                if max(im.size) > max_side:
+                    # VLM image tokens scale with pixel count, so a smaller image is much cheaper.
+                    # Only photos go back out as JPEG; rendered pages and screenshots stay
+                    # lossless PNG so JPEG artifacts don't smear the glyphs sent for OCR
+                    is_photo = im.format == "JPEG"
+                    im.thumbnail((max_side, max_side))
+                    buf = io.BytesIO()
+                    if is_photo:
+                        im.convert("RGB").save(buf, "JPEG", quality=85)
+                    else:
+                        im.save(buf, "PNG")
+                    return base64.b64encode(buf.getvalue()).decode("utf-8")
+
         with open(image_path, "rb") as image_file:
             return base64.b64encode(image_file.read()).decode("utf-8")
     
-    def extract_data(self, image_path: str) -> dict:
+    PROMPTS = {
+        "ocr_text": "Extract all text from this image exactly as shown. If there is no readable text in the image, respond with 'NO_TEXT'.",
+        "image_description": "Provide a detailed description of what's in this image.",
+        "table_data": "If there's a table in this image, extract it as JSON. If no table, return empty object.",
+        "flowchart": "If this is a flowchart, describe its structure and flow. If not, return empty string."
+    }
+
+    COMBINED_PROMPT = (
+        "Return ONLY a JSON object with keys ocr_text (or 'NO_TEXT'), image_description, "
+        "table_data (object or {}), flowchart (string or ''). Extract exactly as shown."
+    )
+
+    def extract_data(self, image_path: str, max_side: int = 1536) -> dict:
         """Extract OCR, description, table data, and flowchart from image"""
 
         
         if not Path(image_path).exists():
             return {"error": f"Image not found: {image_path}"}
         
-        image_base64 = self.encode_image(image_path)
-        
-        prompts = {
-            "ocr_text": "Extract all text from this image exactly as shown. If there is no readable text in the image, respond with 'NO_TEXT'.",
-            "image_description": "Provide a detailed description of what's in this image.",
-            "table_data": "If there's a table in this image, extract it as JSON. If no table, return empty object.",
-            "flowchart": "If this is a flowchart, describe its structure and flow. If not, return empty string."
-        }
-        
+        # Encoded once and reused for every prompt below
+        image_base64 = self.encode_image(image_path, max_side=max_side)
+
+        # One request for all fields so the image is only encoded by the model once.
+        # JSON mode makes an unparseable reply rare, so fall back to a request per
+        # field straight away rather than retrying
+        response = self._generate(self.COMBINED_PROMPT, image_base64, json_mode=True)
+        if response.status_code != 200:
+            return {key: f"Error: {response.status_code}" for key in self.PROMPTS}
+
+        parsed = self._parse_json(response.json().get("response", ""))
+        if parsed is not None:
+            return {
+                "ocr_text": self._clean_ocr(str(parsed.get("ocr_text") or "")),
+                "image_description": parsed.get("image_description", ""),
+                "table_data": parsed.get("table_data", {}),
+                "flowchart": parsed.get("flowchart", ""),
+            }
+
+        return self._extract_per_field(image_base64)
+
+    def _extract_per_field(self, image_base64: str) -> dict:
+        """Legacy mode: one prompt per output field"""
         results = {}
         
-        for key, prompt in prompts.items():
-            response = requests.post(
-                self.endpoint,
-                json={
-                    "model": self.model_name,
-                    "prompt": prompt,
-                    "images": [image_base64],
-                    "stream": False
-                }
-            )
+        for key, prompt in self.PROMPTS.items():
+            response = self._generate(prompt, image_base64)
             
             if response.status_code == 200:
                 result_text = response.json().get("response", "").strip()
                 
                 # Special handling for OCR text
                 if key == "ocr_text":
-                    # Check if there's meaningful text
-                    if not result_text or result_text.upper() == "NO_TEXT" or result_text.startswith("Error:"):
-                        results[key] = None
-                    elif len(result_text) < 3 or result_text.lower() in ["none", "n/a", "null", "no text"]:
-                        results[key] = None
-                    else:
-                        results[key] = result_text
+                    results[key] = self._clean_ocr(result_text)
                 else:
                     results[key] = result_text
             else:
                 results[key] = f"Error: {response.status_code}"
         
         return results
+
+    def _generate(self, prompt: str, image_base64: str, json_mode: bool = False) -> requests.Response:
+        payload = {
+            "model": self.model_name,
+            "prompt": prompt,
+            "images": [image_base64],
+            "stream": False
+        }
+        if json_mode:
+            # Constrain decoding to valid JSON
+            payload["format"] = "json"
+
+        return self.session.post(self.endpoint, json=payload, timeout=120)
+
+    @staticmethod
+    def _parse_json(text: str) -> dict | None:
+        """Parse a JSON object from model output, tolerating surrounding prose"""
+        try:
+            data = orjson.loads(text)
+        except orjson.JSONDecodeError:
+            match = re.search(r"\{.*\}", text, re.DOTALL)
+            if not match:
+                return None
+            try:
+                data = orjson.loads(match.group(0))
+            except orjson.JSONDecodeError:
+                return None
+        return data if isinstance(data, dict) else None
+
+    @staticmethod
+    def _clean_ocr(result_text: str) -> str | None:
+        """Map 'no text' style answers to None"""
+        result_text = result_text.strip()
+        # Check if there's meaningful text
+        if not result_text or result_text.upper() == "NO_TEXT" or result_text.startswith("Error:"):
+            return None
+        if len(result_text) < 3 or result_text.lower() in ["none", "n/a", "null", "no text"]:
+            return None
+        return result_text
     
     def save_json(self, data: dict, output_path: str) -> None:
         """Save extracted data to JSON file"""
-        with open(output_path, "w") as f:
-            json.dump(data, f, indent=2)
+        with open(output_path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
 
 if __name__ == "__main__":
@@ -78,4 +155,4 @@ if __name__ == "__main__":
     extracted = extractor.extract_data(image_path)
     extractor.save_json(extracted, output_path)
     
-    print(json.dumps(extracted, indent=2))
\ No newline at end of file
+    print(orjson.dumps(extracted, option=orjson.OPT_INDENT_2).decode())
\ No newline at end of file
@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import sys
 from halo import Halo
 from colorama import Fore, Style, init
 
@@ -63,9 +64,28 @@ class WebCrawlerService:
             verbose=verbose,
         )
         self.cache_mode = cache_mode
+        self._crawler: AsyncWebCrawler | None = None
 
         logger.success("Browser configuration ready")
 
+    async def __aenter__(self):
+        """
+        Start the browser once so every crawl() inside the block reuses it.
+        """
+        logger.info("Starting persistent browser")
+        self._crawler = await AsyncWebCrawler(config=self.browser_config).__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._crawler is not None:
+            crawler, self._crawler = self._crawler, None
+            # Don't let a failed shutdown mask an exception from the block
+            try:
+                await crawler.__aexit__(exc_type, exc, tb)
+                logger.info("Browser closed")
+            except Exception as e:
+                logger.warning(f"Failed to close browser: {e}")
+
     async def crawl(
         self,
         url: str,
@@ -106,15 +126,22 @@ class WebCrawlerService:
             text="Crawling and processing page",
             spinner="dots",
             color="cyan",
+            enabled=sys.stdout.isatty(),
         )
         spinner.start()
 
         try:
-            async with AsyncWebCrawler(config=self.browser_config) as crawler:
-                result = await crawler.arun(
+            if self._crawler is not None:
+                result = await self._crawler.arun(
                     url=url,
                     config=run_config,
                 )
+            else:
+                async with AsyncWebCrawler(config=self.browser_config) as crawler:
+                    result = await crawler.arun(
+                        url=url,
+                        config=run_config,
+                    )
 
             spinner.succeed("Crawling completed")
 
@@ -1,14 +1,18 @@
 import argparse
 import asyncio
-import json
+import hashlib
 import logging
 import os
 import shutil
 import tempfile
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
 
-import requests
+import orjson
+from PIL import Image
 
 from Extractor.img_ext.img_ext import ImageExtractor
 from Extractor import ext_handler
@@ -48,6 +52,15 @@ logger.addHandler(handler)
 
 
 # ---------------- Agent ---------------- #
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp"}
+OLLAMA_CHECK_TTL = 30.0
+PAGE_CACHE_SIZE = 256
+BLANK_PAGE_THUMB = 512
+BLANK_PAGE_INK_DELTA = 48
+BLANK_PAGE_MAX_INK = 1e-5
+BLANK_PAGE_RESULT = {"ocr_text": None, "image_description": "", "table_data": {}, "flowchart": ""}
+
+
 class ExtractAgent:
     def __init__(
         self,
@@ -58,7 +71,18 @@ class ExtractAgent:
         self.ollama_host = ollama_host.rstrip("/")
         self.image_model = image_model
         self.text_model = text_model
-        self.img_extractor = ImageExtractor(model_name=self.image_model, ollama_host=self.ollama_host)
+        self.max_workers = int(os.getenv("EXTRACT_WORKERS", "4"))
+        self.img_extractor = ImageExtractor(
+            model_name=self.image_model,
+            ollama_host=self.ollama_host,
+            pool_size=self.max_workers,
+        )
+        # Share the extractor's keep-alive session for all Ollama calls
+        self.session = self.img_extractor.session
+        # (checked_at, reachable) from the last Ollama health check
+        self._ollama_ok: Optional[Tuple[float, bool]] = None
+        # Recent extraction results keyed by (pixel digest, image model); reset every run
+        self._page_cache: OrderedDict[Tuple[str, str], Dict[str, Any]] = OrderedDict()
 
         logger.info(f"Agent initialized (image_model={self.image_model}, text_model={self.text_model})")
 
@@ -66,8 +90,19 @@ class ExtractAgent:
         return s.startswith("http://") or s.startswith("https://")
 
     def _check_ollama(self) -> bool:
+        # Reuse a recent result instead of pinging the server for every document
+        if self._ollama_ok is not None:
+            ts, ok = self._ollama_ok
+            if time.monotonic() - ts < OLLAMA_CHECK_TTL:
+                return ok
+
+        ok = self._ping_ollama()
+        self._ollama_ok = (time.monotonic(), ok)
+        return ok
+
+    def _ping_ollama(self) -> bool:
         try:
-            resp = requests.get(f"{self.ollama_host}/api/models")
+            resp = self.session.get(f"{self.ollama_host}/api/tags", timeout=5)
             if resp.status_code == 200:
                 logger.success("Connected to Ollama server")
                 return True
@@ -78,10 +113,16 @@ class ExtractAgent:
             logger.warning(f"Could not connect to Ollama at {self.ollama_host}: {e}")
             return False
 
-    def _agg_image_results(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
-        # Basic aggregation: keep per-page entries and a combined text field
+    def _iter_spool(self, spool: Path) -> Iterator[Dict[str, Any]]:
+        # Page entries written by process_pdf, one JSON object per line
+        with open(spool, "rb") as f:
+            for line in f:
+                yield orjson.loads(line)
+
+    def _agg_image_results(self, spool: Path) -> Dict[str, Any]:
+        # Basic aggregation: a combined text field plus per-kind lists,
+        # reduced page by page from the spool so pages aren't all held in memory
         agg = {
-            "pages": results,
             "combined_text": None,
             "tables": [],
             "descriptions": [],
@@ -89,7 +130,8 @@ class ExtractAgent:
         }
 
         texts = []
-        for r in results:
+        for page in self._iter_spool(spool):
+            r = page["result"]
             if r.get("ocr_text"):
                 texts.append(r["ocr_text"])
             if r.get("table_data"):
@@ -115,44 +157,55 @@ class ExtractAgent:
             return None
 
         prompt = (
-            "You are an offline agent using Llama 3.2.\n" "Given the following page-wise extraction JSON, produce a consolidated JSON with keys: 'text', 'tables', 'summary', 'description'.\n" "Return only valid JSON.\n\n" f"DATA:\n{json.dumps(aggregated, indent=2)}\n"
+            "You are an offline agent using Llama 3.2.\n" "Given the following page-wise extraction JSON, produce a consolidated JSON with keys: 'text', 'tables', 'summary', 'description'.\n" "Return only valid JSON.\n\n" f"DATA:\n{orjson.dumps(aggregated, option=orjson.OPT_INDENT_2).decode()}\n"
         )
 
+        # format=json makes Ollama constrain decoding to valid JSON; streaming lets us
+        # stop reading as soon as the server reports the generation is done
         payload = {
             "model": self.text_model,
             "prompt": prompt,
-            "stream": False,
+            "format": "json",
+            "stream": True,
         }
 
         try:
-            r = requests.post(f"{self.ollama_host}/api/generate", json=payload, timeout=60)
-            if r.status_code == 200:
-                resp = r.json()
-                summary_text = resp.get("response", "")
-                try:
-                    return json.loads(summary_text)
-                except Exception:
-                    # If LLM returned non-JSON, wrap it
-                    return {"summary": summary_text}
-            else:
-                logger.error(f"LLM returned status {r.status_code}")
-                return None
+            with self.session.post(f"{self.ollama_host}/api/generate", json=payload, timeout=60, stream=True) as r:
+                if r.status_code != 200:
+                    logger.error(f"LLM returned status {r.status_code}")
+                    return None
+
+                parts = []
+                for line in r.iter_lines():
+                    if not line:
+                        continue
+                    chunk = orjson.loads(line)
+                    parts.append(chunk.get("response", ""))
+                    if chunk.get("done"):
+                        break
+
+            summary_text = "".join(parts)
+            try:
+                return orjson.loads(summary_text)
+            except Exception:
+                # Only reachable if the stream was cut short
+                return {"summary": summary_text}
         except Exception as e:
             logger.error(f"Error calling Ollama LLM: {e}")
             return None
 
-    def process_pdf(self, input_path: str, tmpdir: Path) -> List[Dict[str, Any]]:
+    def process_pdf(self, input_path: str, tmpdir: Path) -> Path:
         # Convert PDF to images into tmpdir
         logger.info(f"Converting document to images: {input_path}")
         images_out = tmpdir / Path(input_path).stem
         images_out.mkdir(parents=True, exist_ok=True)
 
-        # Lazy import because pdf2image/LibreOffice may not be installed for non-document runs
+        # Lazy import because PyMuPDF/LibreOffice may not be installed for non-document runs
         try:
             from Extractor.doc_ext.convetr import convert_documents_to_images
         except Exception as e:
             logger.error(f"Document conversion dependencies missing: {e}")
-            raise RuntimeError("Document conversion failed due to missing dependencies. Install pdf2image/poppler and libreoffice to enable document conversion.")
+            raise RuntimeError("Document conversion failed due to missing dependencies. Install PyMuPDF and libreoffice to enable document conversion.")
 
         convert_documents_to_images(input_path, str(images_out.parent))
 
@@ -166,37 +219,155 @@ class ExtractAgent:
         images = sorted(page_folder.glob("page_*.png"))
         logger.info(f"Found {len(images)} page images in {page_folder}")
 
-        results = []
-        for img in images:
-            logger.info(f"Extracting from image: {img}")
-            data = self.img_extractor.extract_data(str(img))
-            results.append({"page": img.name, "result": data})
-            logger.success(f"Extracted page {img.name}")
-        return results
-
-    def process_images(self, image_paths: List[str]) -> List[Dict[str, Any]]:
-        results = []
-        for p in image_paths:
-            logger.info(f"Extracting from image: {p}")
-            data = self.img_extractor.extract_data(p)
-            results.append({"image": Path(p).name, "result": data})
+        # Append each page to an on-disk JSONL spool as it's done, so only the
+        # extraction window is in memory at a time
+        spool = tmpdir / "pages.jsonl"
+        with open(spool, "wb") as f:
+            for img, data in self._iter_extracted(images, skip_blank=True):
+                f.write(orjson.dumps({"page": img.name, "result": data}) + b"\n")
+
+        return spool
+
+    def _is_blank(self, image_path: Path) -> bool:
+        # Count "ink" pixels that differ clearly from the background (the most common
+        # shade, so dark slides work too) on a 512px thumbnail. Kept deliberately strict:
+        # a lone page number or one short line still counts as content
+        with Image.open(image_path) as im:
+            thumb = im.convert("L")
+            thumb.thumbnail((BLANK_PAGE_THUMB, BLANK_PAGE_THUMB))
+
+        hist = thumb.histogram()
+        background = max(range(256), key=hist.__getitem__)
+        ink = sum(n for shade, n in enumerate(hist) if abs(shade - background) > BLANK_PAGE_INK_DELTA)
+        return ink / (thumb.width * thumb.height) < BLANK_PAGE_MAX_INK
+
+    def _write_output(self, output_path: str, output: Dict[str, Any], spool: Optional[Path] = None) -> None:
+        # Same layout as orjson.dumps(output, option=OPT_INDENT_2), but "pages" is copied
+        # from the spool one line at a time so a document's pages never sit in memory together
+        def dump(value: Any, indent: bytes) -> bytes:
+            # JSON strings can't hold raw newlines, so this only re-indents structure
+            return orjson.dumps(value, option=orjson.OPT_INDENT_2).replace(b"\n", b"\n" + indent)
+
+        with open(output_path, "wb") as f:
+            f.write(b"{")
+            for i, (key, value) in enumerate(output.items()):
+                f.write(b",\n  " if i else b"\n  ")
+                f.write(orjson.dumps(key) + b": ")
+
+                if key != "pages" or spool is None:
+                    f.write(dump(value, b"  "))
+                    continue
+
+                f.write(b"[")
+                empty = True
+                for n, page in enumerate(self._iter_spool(spool)):
+                    f.write(b",\n    " if n else b"\n    ")
+                    f.write(dump(page, b"    "))
+                    empty = False
+                f.write(b"]" if empty else b"\n  ]")
+            f.write(b"\n}" if output else b"}")
+
+    def process_images(self, image_paths: Iterable[str]) -> List[Dict[str, Any]]:
+        # Paths are pulled lazily, so a directory walk is never fully listed up front
+        return [{"image": Path(p).name, "result": d} for p, d in self._iter_extracted(image_paths)]
+
+    def _iter_extracted(self, image_paths: Iterable[Any], skip_blank: bool = False) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        # Yield (path, result) in input order. One thread pool serves the whole input and a
+        # sliding window keeps at most 2x max_workers extractions queued, so Ollama stays busy
+        # while hashing/blank checks for later images run here, and memory stays bounded.
+        # Identical images (duplicate slides, repeated scans) are only sent once.
+        window: Deque[Tuple[Any, Any, Optional[Tuple[str, str]]]] = deque()
+        in_flight: Dict[Tuple[str, str], Future] = {}
+        limit = self.max_workers * 2
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+            for p in image_paths:
+                if skip_blank and self._is_blank(p):
+                    # Blank pages (separators, empty backs of scans) skip the VLM entirely
+                    logger.warning(f"Skipping blank page: {Path(p).name}")
+                    window.append((p, BLANK_PAGE_RESULT.copy(), None))
+                else:
+                    key = self._page_key(p)
+                    if key in self._page_cache:
+                        self._page_cache.move_to_end(key)
+                        logger.info(f"Reusing extraction for duplicate image: {p}")
+                        window.append((p, dict(self._page_cache[key]), None))
+                    elif key in in_flight:
+                        logger.info(f"Reusing extraction for duplicate image: {p}")
+                        window.append((p, in_flight[key], None))
+                    else:
+                        logger.info(f"Extracting from image: {p}")
+                        in_flight[key] = ex.submit(self.img_extractor.extract_data, str(p))
+                        window.append((p, in_flight[key], key))
+
+                # Hand back finished results from the front; block only once the window is full
+                while window and (len(window) > limit or self._entry_done(window[0])):
+                    yield self._finish_entry(window.popleft(), in_flight)
+
+            while window:
+                yield self._finish_entry(window.popleft(), in_flight)
+
+    def _entry_done(self, entry: Tuple[Any, Any, Optional[Tuple[str, str]]]) -> bool:
+        value = entry[1]
+        return not isinstance(value, Future) or value.done()
+
+    def _finish_entry(
+        self,
+        entry: Tuple[Any, Any, Optional[Tuple[str, str]]],
+        in_flight: Dict[Tuple[str, str], Future],
+    ) -> Tuple[Any, Dict[str, Any]]:
+        # key is only set on the entry that submitted the request, so caching and
+        # logging happen once per unique image
+        p, value, key = entry
+        if not isinstance(value, Future):
+            return p, value
+
+        data = value.result()
+        if key is not None:
+            in_flight.pop(key, None)
             logger.success(f"Extracted image {p}")
-        return results
-
-    def process_audio(self, audio_path: str) -> Dict[str, Any]:
+            # Failed extractions are returned but not cached, so they get retried
+            if not self._is_failed(data):
+                self._page_cache[key] = data
+                self._page_cache.move_to_end(key)
+                while len(self._page_cache) > PAGE_CACHE_SIZE:
+                    self._page_cache.popitem(last=False)
+        return p, dict(data)
+
+    def _is_failed(self, data: Dict[str, Any]) -> bool:
+        return "error" in data or any(isinstance(v, str) and v.startswith("Error:") for v in data.values())
+
+    def _page_key(self, image_path: str) -> Tuple[str, str]:
+        # Digest of the decoded pixels, so only truly identical images share a result;
+        # falls back to the path if the image can't be read
+        try:
+            with Image.open(image_path) as im:
+                h = hashlib.blake2b(digest_size=16)
+                h.update(f"{im.mode}:{im.size}".encode())
+                h.update(im.tobytes())
+                key = h.hexdigest()
+        except Exception:
+            key = str(image_path)
+        return (key, self.image_model)
+
+    async def process_audio(self, audio_path: str) -> Dict[str, Any]:
         logger.info(f"Transcribing audio: {audio_path}")
         try:
-            transcript = asyncio.run(ext_handler.transcribe_audio(audio_path))
+            # get_transcriber caches the loaded model, so only the first file pays for loading
+            transcriber = await asyncio.to_thread(
+                ext_handler.get_transcriber, model_size="base", device="auto"
+            )
+            transcript = await asyncio.to_thread(transcriber.transcribe, audio_path)
             logger.success("Transcription completed")
             return transcript
         except Exception as e:
             logger.error(f"Failed to transcribe audio: {e}")
             raise
 
-    def process_url(self, url: str) -> str:
+    async def process_url(self, url: str) -> str:
         logger.info(f"Crawling URL: {url}")
         try:
-            raw_md = asyncio.run(ext_handler.crawl(url=url))
+            raw_md = await ext_handler.crawl(url=url)
             logger.success("Crawl completed")
             return raw_md
         except Exception as e:
@@ -204,23 +375,29 @@ class ExtractAgent:
             raise
 
     def run(self, input_path: str, output_path: str):
+        asyncio.run(self.run_async(input_path, output_path))
+
+    async def run_async(self, input_path: str, output_path: str):
         p = Path(input_path)
         tmpdir = Path(tempfile.mkdtemp(prefix="extract_agent_"))
         logger.info(f"Working in temporary dir: {tmpdir}")
+        self._page_cache.clear()
+
+        spool: Optional[Path] = None
 
         try:
             aggregated_output: Dict[str, Any] = {"source": input_path}
 
             if self._is_url(input_path):
-                md = self.process_url(input_path)
+                md = await self.process_url(input_path)
                 aggregated_output["type"] = "url"
                 aggregated_output["content"] = md
 
             elif p.is_dir():
                 logger.info(f"Processing directory: {p}")
-                images = [str(x) for x in p.rglob("*.png")]
-                logger.info(f"Found {len(images)} images in directory")
+                images = (str(x) for x in p.rglob("*") if x.suffix.lower() in IMAGE_EXTENSIONS and x.is_file())
                 images_res = self.process_images(images)
+                logger.info(f"Processed {len(images_res)} images in directory")
                 aggregated_output["type"] = "images_dir"
                 aggregated_output["images"] = images_res
 
@@ -228,10 +405,11 @@ class ExtractAgent:
                 ext = p.suffix.lower()
                 if ext in {".pdf", ".docx", ".pptx"}:
                     logger.info("Detected document file -> converting to images and extracting")
-                    results = self.process_pdf(str(p), tmpdir)
-                    aggregated = self._agg_image_results([r["result"] for r in results])
+                    spool = self.process_pdf(str(p), tmpdir)
+                    aggregated = self._agg_image_results(spool)
                     aggregated_output["type"] = "document"
-                    aggregated_output["pages"] = results
+                    # Filled from the spool while the output file is written
+                    aggregated_output["pages"] = None
                     aggregated_output["aggregated"] = aggregated
 
                     # Try to consolidate with LLM
@@ -239,7 +417,7 @@ class ExtractAgent:
                     if llm_summary:
                         aggregated_output["llm_summary"] = llm_summary
 
-                elif ext in {".png", ".jpg", ".jpeg"}:
+                elif ext in IMAGE_EXTENSIONS:
                     logger.info("Detected image file -> extracting")
                     res = self.process_images([str(p)])
                     aggregated_output["type"] = "image"
@@ -247,7 +425,7 @@ class ExtractAgent:
 
                 elif ext in {".wav", ".mp3"}:
                     logger.info("Detected audio file -> transcribing")
-                    transcript = self.process_audio(str(p))
+                    transcript = await self.process_audio(str(p))
                     aggregated_output["type"] = "audio"
                     aggregated_output["transcript"] = transcript
 
@@ -260,8 +438,7 @@ class ExtractAgent:
                 raise FileNotFoundError(input_path)
 
             # Save final JSON
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(aggregated_output, f, indent=2)
+            self._write_output(output_path, aggregated_output, spool=spool)
 
             logger.success(f"Saved output to {output_path}")
 